@@ -1,13 +1,59 @@
-import copy
 import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
+import torch.distributed as dist
+from torch.nn.parallel import DistributedDataParallel as DDP
 from torch.optim.lr_scheduler import CosineAnnealingLR
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 
 device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+# single-kernel Adam on GPU, multi-tensor Adam otherwise
+adam_kwargs = {"fused": True} if torch.cuda.is_available() else {"foreach": True}
+
+def host_copy(obj):
+	# copy every tensor in a (nested) state dict to host memory, pinned and non-blocking for GPU tensors
+	if isinstance(obj, torch.Tensor):
+		if obj.is_cuda:
+			return torch.empty(obj.shape, dtype=obj.dtype, pin_memory=True).copy_(obj, non_blocking=True)
+		return obj.detach().clone()
+	if isinstance(obj, dict):
+		out = type(obj)((k, host_copy(v)) for k, v in obj.items())
+		if hasattr(obj, "_metadata"):
+			out._metadata = obj._metadata
+		return out
+	if isinstance(obj, (list, tuple)):
+		return type(obj)(host_copy(v) for v in obj)
+	return obj
+
+def stack_twin_critic(state_dict):
+	# remap a checkpoint of the original two-tower critic (l1..l3 = Q1, l4..l6 = Q2) to the stacked layout
+	if "l1.weight" not in state_dict:
+		return state_dict
+	out = {}
+	for i in range(1, 4):
+		out[f"w{i}"] = torch.stack([state_dict[f"l{i}.weight"], state_dict[f"l{i + 3}.weight"]])
+		out[f"b{i}"] = torch.stack([state_dict[f"l{i}.bias"], state_dict[f"l{i + 3}.bias"]]).unsqueeze(1)
+	return out
+
+def stack_twin_critic_optimizer(state_dict):
+	# same remap for the Adam state: old params are ordered l1.weight, l1.bias, ..., l6.bias, new ones w1, b1, ..., b3
+	group = state_dict["param_groups"][0]
+	if len(group["params"]) != 12:
+		return state_dict
+	old = [state_dict["state"].get(p) for p in group["params"]]
+	state = {}
+	for j in range(6):
+		q1, q2 = old[j], old[j + 6]
+		if q1 is None:
+			continue
+		bias = j % 2 == 1
+		state[j] = {k: torch.stack([q1[k], q2[k]]).unsqueeze(1) if bias else torch.stack([q1[k], q2[k]])
+			for k in ("exp_avg", "exp_avg_sq")}
+		state[j]["step"] = q1["step"]
+	return {"state": state, "param_groups": [dict(group, params=list(range(6)))]}
 
 def expectile_loss(diff, expectile=0.7):
     weight = torch.where(diff > 0, expectile, (1 - expectile))
@@ -34,25 +80,31 @@ class Critic(nn.Module):
 	def __init__(self, state_dim, action_dim):
 		super(Critic, self).__init__()
 
-		self.l1 = nn.Linear(state_dim + action_dim, 256)
-		self.l2 = nn.Linear(256, 256)
-		self.l3 = nn.Linear(256, 1)
-
-		self.l4 = nn.Linear(state_dim + action_dim, 256)
-		self.l5 = nn.Linear(256, 256)
-		self.l6 = nn.Linear(256, 1)
-
-	def forward(self, state, action):
-		sa = torch.cat([state, action], -1)
-
-		q1 = F.relu(self.l1(sa))
-		q1 = F.relu(self.l2(q1))
-		q1 = self.l3(q1)
-
-		q2 = F.relu(self.l4(sa))
-		q2 = F.relu(self.l5(q2))
-		q2 = self.l6(q2)
-		return q1, q2
+		# Q1 and Q2 are stacked along dim 0 so that both heads run as a single batched GEMM per layer
+		self.w1, self.b1 = self._twin_linear(state_dim + action_dim, 256)
+		self.w2, self.b2 = self._twin_linear(256, 256)
+		self.w3, self.b3 = self._twin_linear(256, 1)
+
+	@staticmethod
+	def _twin_linear(in_features, out_features):
+		# same init as nn.Linear, applied independently to each head
+		bound = 1.0 / np.sqrt(in_features)
+		weight = nn.Parameter(torch.empty(2, out_features, in_features).uniform_(-bound, bound))
+		bias = nn.Parameter(torch.empty(2, 1, out_features).uniform_(-bound, bound))
+		return weight, bias
+
+	def forward(self, sa):
+		# sa is the already concatenated (state, action) batch
+		sa = sa.unsqueeze(0).expand(2, -1, -1)
+
+		q = F.relu(torch.baddbmm(self.b1, sa, self.w1.transpose(1, 2)))
+		q = F.relu(torch.baddbmm(self.b2, q, self.w2.transpose(1, 2)))
+		if q.dtype == torch.float32:
+			q = torch.baddbmm(self.b3, q, self.w3.transpose(1, 2))
+		else:
+			# under bf16 autocast the 256->1 output layer still runs in fp32 (mul/sum are not downcast)
+			q = (q.float() * self.w3).sum(-1, keepdim=True) + self.b3
+		return q[0], q[1]
 
 class ValueCritic(nn.Module):
 	def __init__(self, state_dim):
@@ -63,11 +115,13 @@ class ValueCritic(nn.Module):
 		self.l3 = nn.Linear(256, 1)
 
 	def forward(self, state):
-		sa = torch.cat([state], -1)
-
-		q1 = F.relu(self.l1(sa))
+		q1 = F.relu(self.l1(state))
 		q1 = F.relu(self.l2(q1))
-		q1 = self.l3(q1)
+		if q1.dtype == torch.float32:
+			q1 = self.l3(q1)
+		else:
+			# under bf16 autocast the 256->1 output layer still runs in fp32 (mul/sum are not downcast)
+			q1 = (q1.float() * self.l3.weight).sum(-1, keepdim=True) + self.l3.bias
 		return q1
 
 
@@ -88,20 +142,67 @@ class DMG(object):
 		lam_end=0.5,
 		nu = 0.5,
 		nu_end = 0.005,
+		cuda_graph=False,
+		torch_compile=False,
+		bf16=False,
 	):
 		
-		self.actor = Actor(state_dim, action_dim, max_action).to(device)
-		self.actor_target = copy.deepcopy(self.actor)
-		self.actor_optimizer = torch.optim.Adam(self.actor.parameters(), lr=3e-4)
-		self.critic = Critic(state_dim, action_dim).to(device)
-		self.critic_optimizer = torch.optim.Adam(self.critic.parameters(), lr=3e-4)
-		self.critic_target = copy.deepcopy(self.critic)
-		self.value_critic = ValueCritic(state_dim).to(device)
-		self.value_critic_optimizer = torch.optim.Adam(self.value_critic.parameters(), lr=3e-4)
+		distributed = dist.is_available() and dist.is_initialized()
+		# opt-in bf16 autocast, only on GPUs with native bf16 (Ampere+); older ones would emulate it
+		self.bf16 = bf16 and device.type == "cuda" and torch.cuda.is_bf16_supported(including_emulation=False)
+		# the offline step is captured as a CUDA graph; needs capturable optimizers and a tensor lr for the scheduler
+		self.cuda_graph = cuda_graph and device.type == "cuda" and not distributed
+		optim_kwargs = dict(adam_kwargs, capturable=True) if self.cuda_graph else adam_kwargs
+		actor_lr = torch.tensor(3e-4, device=device) if self.cuda_graph else 3e-4
+
+		if torch_compile:
+			# Inductor fuses each MLP into autotuned kernels; CUDA graphs are left to the manual capture when it is on
+			mode = "max-autotune-no-cudagraphs" if self.cuda_graph else "max-autotune"
+			build = lambda net: torch.compile(net.to(device), mode=mode, fullgraph=True)
+		else:
+			# networks are TorchScript-compiled by default to cut per-call Python dispatch; unlike
+			# torch.compile it needs no Triton toolchain and has no per-shape compile warmup
+			build = lambda net: torch.jit.script(net.to(device))
+
+		self.actor = build(Actor(state_dim, action_dim, max_action))
+		self.actor_target = build(Actor(state_dim, action_dim, max_action))
+		self.actor_target.load_state_dict(self.actor.state_dict())
+		self.actor_optimizer = torch.optim.Adam(self.actor.parameters(), lr=actor_lr, **optim_kwargs)
+		self.critic = build(Critic(state_dim, action_dim))
+		self.critic_optimizer = torch.optim.Adam(self.critic.parameters(), lr=3e-4, **optim_kwargs)
+		self.critic_target = build(Critic(state_dim, action_dim))
+		self.critic_target.load_state_dict(self.critic.state_dict())
+		# targets only change through the Polyak update, so skip autograd bookkeeping for them
+		for p in self.actor_target.parameters():
+			p.requires_grad_(False)
+		for p in self.critic_target.parameters():
+			p.requires_grad_(False)
+		self.value_critic = build(ValueCritic(state_dim))
+		self.value_critic_optimizer = torch.optim.Adam(self.value_critic.parameters(), lr=3e-4, **optim_kwargs)
+		self.actor_params = list(self.actor.parameters())
+		self.actor_target_params = list(self.actor_target.parameters())
+		self.critic_params = list(self.critic.parameters())
+		self.critic_target_params = list(self.critic_target.parameters())
+		self._state_buf = torch.empty(1, state_dim, device=device)
+
+		# the critic (still compiled, without the DDP wrapper) for the actor loss, which only
+		# passes gradients through to the actor and so needs no critic all-reduce
+		self._critic_local = self.critic
+		if distributed:
+			# one process per GPU (torchrun); gradients of the live networks are all-reduced in backward
+			local_rank = int(os.environ["LOCAL_RANK"])
+			self.actor = DDP(self.actor, device_ids=[local_rank])
+			self.critic = DDP(self.critic, device_ids=[local_rank])
+			self.value_critic = DDP(self.value_critic, device_ids=[local_rank])
+			# DDP broadcast rank 0's weights; keep the targets consistent with them
+			self._unwrap(self.actor_target).load_state_dict(self._unwrap(self.actor).state_dict())
+			self._unwrap(self.critic_target).load_state_dict(self._unwrap(self.critic).state_dict())
         
 		self.replay_buffer = replay_buffer
 		self.max_action = max_action
+		self.state_dim = state_dim
 		self.action_dim = action_dim
+		self._alloc_batch_buffers(256)
 		self.discount = discount
 		self.tau = tau
 		self.policy_freq = policy_freq
@@ -116,96 +217,221 @@ class DMG(object):
 		self.total_it = 0
 		self.decay_rate = 1
 		self.exp_decay = 0.99
-
+		self._pending_logs = []
+		self._graph_warmup = 10
+		self._graph_stream = torch.cuda.Stream() if self.cuda_graph else None
+		self._polyak_graph = None
+		self._save_executor = ThreadPoolExecutor(max_workers=1)
+		self._save_futures = []
+
+
+	def _log_scalars(self, writer, scalars):
+		# copy the GPU scalars to pinned host memory without syncing; they are written once the copy lands
+		if writer is None:
+			return
+		values = torch.stack([v.detach().float() for v in scalars.values()])
+		host = torch.empty(values.shape, pin_memory=values.is_cuda)
+		host.copy_(values, non_blocking=True)
+		event = None
+		if values.is_cuda:
+			event = torch.cuda.Event()
+			event.record()
+		self._pending_logs.append((writer, list(scalars), host, event, self.total_it))
+
+	def flush_logs(self, wait=True):
+		while self._pending_logs:
+			writer, tags, host, event, step = self._pending_logs[0]
+			if event is not None:
+				if not wait and not event.query():
+					break
+				event.synchronize()
+			for tag, value in zip(tags, host.tolist()):
+				writer.add_scalar(tag, value, step)
+			self._pending_logs.pop(0)
+
+	def _autocast(self):
+		# bf16 autocast for network forwards when enabled; outputs are cast back so losses reduce in fp32
+		# the weight-cast cache is disabled because it is not safe under CUDA graph capture
+		return torch.autocast(device_type=device.type, dtype=torch.bfloat16, enabled=self.bf16, cache_enabled=False)
+
+	def _alloc_batch_buffers(self, batch_size):
+		# per-step scratch tensors, reused across steps to avoid allocator churn
+		self._noise_buf = torch.empty(batch_size, self.action_dim, device=device)
+		# (state, action) rows on top, (next_state, next_action) rows below, so critic_target
+		# evaluates both in one batched pass; _sa_buf/_nsa_buf are views of the two halves
+		self._target_sa_buf = torch.empty(2 * batch_size, self.state_dim + self.action_dim, device=device)
+		self._sa_buf = self._target_sa_buf[:batch_size]
+		self._nsa_buf = self._target_sa_buf[batch_size:]
+		# captured graphs read the buffers above, so they are recaptured after reallocation
+		self._offline_graphs = {}
+
+	def _fill_sa(self, buf, state, action):
+		buf[:, :self.state_dim].copy_(state)
+		buf[:, self.state_dim:].copy_(action)
+		return buf
+
+	def _polyak_update(self):
+		with torch.no_grad():
+			torch._foreach_mul_(self.critic_target_params, 1 - self.tau)
+			torch._foreach_add_(self.critic_target_params, self.critic_params, alpha=self.tau)
+
+			torch._foreach_mul_(self.actor_target_params, 1 - self.tau)
+			torch._foreach_add_(self.actor_target_params, self.actor_params, alpha=self.tau)
+
+	def _soft_update_targets(self):
+		# inside a whole-step capture the update is simply recorded into that graph
+		if device.type != "cuda" or torch.cuda.is_current_stream_capturing():
+			self._polyak_update()
+			return
+		if self._polyak_graph is not None:
+			self._polyak_graph.replay()
+			return
+		# first call runs eagerly (also warming up the foreach kernels), then the update is captured;
+		# the parameter tensors are updated in place everywhere else, so the captured addresses stay valid
+		self._polyak_update()
+		graph = torch.cuda.CUDAGraph()
+		with torch.cuda.graph(graph):
+			self._polyak_update()
+		self._polyak_graph = graph
+
+	@staticmethod
+	def _unwrap(net):
+		# strip DDP and torch.compile wrappers so state dict keys match plain modules
+		net = net.module if isinstance(net, DDP) else net
+		return getattr(net, "_orig_mod", net)
 
 	def select_action(self, state):
+		# the actor has no dropout/batchnorm, so no eval()/train() toggle is needed; no_grad rather than
+		# inference_mode, which a scripted module with trainable parameters can reject depending on call order
 		with torch.no_grad():
-			self.actor.eval()
-			state = torch.FloatTensor(state.reshape(1, -1)).to(device)
-			action = self.actor(state).cpu().data.numpy().flatten()
-			self.actor.train()
-			return action
+			self._state_buf.copy_(torch.from_numpy(np.asarray(state).reshape(1, -1)), non_blocking=True)
+			return self._unwrap(self.actor)(self._state_buf).squeeze(0).cpu().numpy()
 
 	def train_offline(self, batch_size=256, writer=None):
 		self.total_it += 1
+		self.flush_logs(wait=False)
+		if self._noise_buf.shape[0] != batch_size:
+			self._alloc_batch_buffers(batch_size)
+		update_actor = self.total_it % self.policy_freq == 0
+		log_due = self.total_it % 10000 == 0
+
+		if self.cuda_graph and not log_due:
+			self._train_offline_graphed(batch_size, update_actor)
+		else:
+			stats = self._train_offline_step(batch_size, update_actor, log_due)
+			if log_due:
+				self._log_scalars(writer, stats)
+
+		if update_actor:
+			self.actor_lr_schedule.step()
 
+	def _train_offline_graphed(self, batch_size, update_actor):
+		if self._graph_warmup > 0:
+			# warm up on a side stream before capture, as CUDA graph capture requires
+			self._graph_warmup -= 1
+			self._graph_stream.wait_stream(torch.cuda.current_stream())
+			with torch.cuda.stream(self._graph_stream):
+				self._train_offline_step(batch_size, update_actor)
+			torch.cuda.current_stream().wait_stream(self._graph_stream)
+			return
+
+		if not self._offline_graphs:
+			# one graph with and one without the delayed actor update; capturing does not run the step
+			for flag in (False, True):
+				graph = torch.cuda.CUDAGraph()
+				with torch.cuda.graph(graph):
+					self._train_offline_step(batch_size, flag)
+				self._offline_graphs[flag] = graph
+		self._offline_graphs[update_actor].replay()
+
+	def _train_offline_step(self, batch_size, update_actor, log_due=False):
+		# one offline update with no host syncs or Python-side state, so it can be captured in a CUDA graph
 		# Sample replay buffer 
 		state, action, next_state, reward, not_done = self.replay_buffer.sample(batch_size)
+		sa = self._fill_sa(self._sa_buf, state, action)
+
+		# target Q on the dataset (state, action) and on (next_state, next_action) in one frozen-network pass;
+		# the first half is shared by the value and actor updates, the second feeds the Bellman target
+		with torch.inference_mode(), self._autocast():
+			noise = self._noise_buf.normal_(0, 0.2).clamp_(-0.5, 0.5)
+			next_action = (self.actor_target(next_state).float() + noise).clamp(-self.max_action, self.max_action)
+			self._fill_sa(self._nsa_buf, next_state, next_action)
+			target_q1, target_q2 = self.critic_target(self._target_sa_buf)
+			target_q = torch.minimum(target_q1, target_q2).float()
+			target_sa_min, target_Q_pi = target_q[:batch_size], target_q[batch_size:]
 
 		# value_critic
-		with torch.no_grad():
-			iql_q1, iql_q2 = self.critic_target(state, action)
-			iql_q = torch.cat([iql_q1, iql_q2],dim=1)
-			iql_q,_ = torch.min(iql_q,dim=1,keepdim=True)
-		iql_v = self.value_critic(state)
+		iql_q = target_sa_min
+		with self._autocast():
+			iql_v = self.value_critic(state).float()
 		value_loss = expectile_loss(iql_q - iql_v, self.expectile).mean()
-		self.value_critic_optimizer.zero_grad()
+		self.value_critic_optimizer.zero_grad(set_to_none=True)
 		value_loss.backward()
 		self.value_critic_optimizer.step()
 
 		# critic
+		# Compute the target Q value; target_Q is built under no_grad since mse_loss saves it for backward
 		with torch.no_grad():
-			noise = (torch.randn_like(action) * 0.2).clamp(-0.5, 0.5)
-			next_action = (self.actor_target(next_state) + noise).clamp(-self.max_action, self.max_action)
-		# Compute the target Q value
-		with torch.no_grad():
-			target_Q1, target_Q2 = self.critic_target(next_state, next_action)
-			target_Q_pi = torch.cat([target_Q1, target_Q2],dim=1)
-			target_Q_pi,_ = torch.min(target_Q_pi,dim=1,keepdim=True)
-			target_Q_iql = self.value_critic(next_state)
+			with self._autocast():
+				target_Q_iql = self.value_critic(next_state).float()
 			target_Q = reward + not_done * self.discount * (self.lam * target_Q_pi + (1-self.lam) * target_Q_iql)
 
 		# Get current Q estimates
-		current_Q1, current_Q2 = self.critic(state, action)
+		with self._autocast():
+			current_Q1, current_Q2 = self.critic(sa)
+			current_Q1, current_Q2 = current_Q1.float(), current_Q2.float()
 		critic_loss =  F.mse_loss(current_Q1, target_Q) + F.mse_loss(current_Q2, target_Q)
-		if self.total_it % 10000 == 0:
+		# logging scalars are only reduced on steps that write them
+		stats = {}
+		if log_due:
 			with torch.no_grad():
-				writer.add_scalar('train/critic_loss', critic_loss.item(), self.total_it)
 				curr_Q = torch.cat([current_Q1, current_Q2],dim=1)
-				writer.add_scalar('train/Q', curr_Q.mean().item(), self.total_it)
-				writer.add_scalar('train/iqlV', iql_v.mean().item(), self.total_it)
+				stats = {
+					'train/critic_loss': critic_loss,
+					'train/Q': curr_Q.mean(),
+					'train/iqlV': iql_v.mean(),
+				}
 		# Optimize the critic
-		self.critic_optimizer.zero_grad()
+		self.critic_optimizer.zero_grad(set_to_none=True)
 		critic_loss.backward()
 		self.critic_optimizer.step()
 
 		# Delayed policy updates
-		if self.total_it % self.policy_freq == 0:
+		if update_actor:
 			# Compute actor loss
-			pi = self.actor(state)
+			with self._autocast():
+				pi = self.actor(state).float()
 			with torch.no_grad():
-				awr_v = self.value_critic(state)
-				awr_q1, awr_q2 = self.critic_target(state, action)
-				awr_q = torch.minimum(awr_q1, awr_q2)
+				with self._autocast():
+					awr_v = self.value_critic(state).float()
+				awr_q = target_sa_min
 				exp_a = torch.exp((awr_q - awr_v) * self.temp)
 				exp_a = torch.clamp(exp_a, max=self.max_weight).detach()
 
-			v1,v2 = self.critic(state, pi)
-			v = torch.cat([v1,v2], dim=1)
-			vmin,_ = torch.min(v, dim=1)
+			with self._autocast():
+				v1,v2 = self._critic_local(torch.cat([state, pi], -1))
+				vmin = torch.minimum(v1, v2).squeeze(-1).float()
 			lmbda = 1.0 / vmin.abs().mean().detach() # follow TD3BC
 			q_loss = -lmbda * vmin.mean()
 
 			awr_loss = (exp_a * ((pi - action)**2)).mean()
 			actor_loss = q_loss + self.nu * awr_loss
 
-			self.actor_optimizer.zero_grad()
+			self.actor_optimizer.zero_grad(set_to_none=True)
 			actor_loss.backward()
 			self.actor_optimizer.step()
-			self.actor_lr_schedule.step()
 
-			if self.total_it % 10000 == 0:
-				writer.add_scalar('train/actor_loss', actor_loss.item(), self.total_it)
+			if log_due:
+				stats['train/actor_loss'] = actor_loss
 
 			# Update the frozen target models
-			for param, target_param in zip(self.critic.parameters(), self.critic_target.parameters()):
-				target_param.data.copy_(self.tau * param.data + (1 - self.tau) * target_param.data)
+			self._soft_update_targets()
 
-			for param, target_param in zip(self.actor.parameters(), self.actor_target.parameters()):
-				target_param.data.copy_(self.tau * param.data + (1 - self.tau) * target_param.data)
+		return stats
 
 	def train_online(self, batch_size=256, writer=None):
 		self.total_it += 1
+		self.flush_logs(wait=False)
 		if self.total_it % 1000 == 0:
 			self.decay_rate = self.decay_rate * self.exp_decay
 		lam = self.lam_end - (self.lam_end - self.lam) * self.decay_rate
@@ -213,104 +439,132 @@ class DMG(object):
 
 		# Sample replay buffer 
 		state, action, next_state, reward, not_done = self.replay_buffer.sample(batch_size)
+		if self._noise_buf.shape[0] != batch_size:
+			self._alloc_batch_buffers(batch_size)
+		sa = self._fill_sa(self._sa_buf, state, action)
+
+		# target Q on the dataset (state, action) and on (next_state, next_action) in one frozen-network pass;
+		# the first half is shared by the value and actor updates, the second feeds the Bellman target
+		with torch.inference_mode(), self._autocast():
+			noise = self._noise_buf.normal_(0, 0.2).clamp_(-0.5, 0.5)
+			next_action = (self.actor_target(next_state).float() + noise).clamp(-self.max_action, self.max_action)
+			self._fill_sa(self._nsa_buf, next_state, next_action)
+			target_q1, target_q2 = self.critic_target(self._target_sa_buf)
+			target_q = torch.minimum(target_q1, target_q2).float()
+			target_sa_min, target_Q_pi = target_q[:batch_size], target_q[batch_size:]
 
 		# value_critic
-		with torch.no_grad():
-			iql_q1, iql_q2 = self.critic_target(state, action)
-			iql_q = torch.cat([iql_q1, iql_q2],dim=1)
-			iql_q,_ = torch.min(iql_q,dim=1,keepdim=True)
-		iql_v = self.value_critic(state)
+		iql_q = target_sa_min
+		with self._autocast():
+			iql_v = self.value_critic(state).float()
 		value_loss = expectile_loss(iql_q - iql_v, self.expectile).mean()
-		self.value_critic_optimizer.zero_grad()
+		self.value_critic_optimizer.zero_grad(set_to_none=True)
 		value_loss.backward()
 		self.value_critic_optimizer.step()
 
 		# critic
+		# Compute the target Q value; target_Q is built under no_grad since mse_loss saves it for backward
 		with torch.no_grad():
-			noise = (torch.randn_like(action) * 0.2).clamp(-0.5, 0.5)
-			next_action = (self.actor_target(next_state) + noise).clamp(-self.max_action, self.max_action)
-		# Compute the target Q value
-		with torch.no_grad():
-			target_Q1, target_Q2 = self.critic_target(next_state, next_action)
-			target_Q_pi = torch.cat([target_Q1, target_Q2],dim=1)
-			target_Q_pi,_ = torch.min(target_Q_pi,dim=1,keepdim=True)
-			target_Q_iql = self.value_critic(next_state)
+			with self._autocast():
+				target_Q_iql = self.value_critic(next_state).float()
 			target_Q = reward + not_done * self.discount * (lam * target_Q_pi + (1-lam) * target_Q_iql)
 
 		# Get current Q estimates
-		current_Q1, current_Q2 = self.critic(state, action)
+		with self._autocast():
+			current_Q1, current_Q2 = self.critic(sa)
+			current_Q1, current_Q2 = current_Q1.float(), current_Q2.float()
 		critic_loss =  F.mse_loss(current_Q1, target_Q) + F.mse_loss(current_Q2, target_Q)
 		if self.total_it % 10000 == 0:
 			with torch.no_grad():
-				writer.add_scalar('train/critic_loss', critic_loss.item(), self.total_it)
 				curr_Q = torch.cat([current_Q1, current_Q2],dim=1)
-				writer.add_scalar('train/Q', curr_Q.mean().item(), self.total_it)
-				writer.add_scalar('train/iqlV', iql_v.mean().item(), self.total_it)
+				self._log_scalars(writer, {
+					'train/critic_loss': critic_loss,
+					'train/Q': curr_Q.mean(),
+					'train/iqlV': iql_v.mean(),
+				})
 		# Optimize the critic
-		self.critic_optimizer.zero_grad()
+		self.critic_optimizer.zero_grad(set_to_none=True)
 		critic_loss.backward()
 		self.critic_optimizer.step()
 
 		# Delayed policy updates
 		if self.total_it % self.policy_freq == 0:
 			# Compute actor loss
-			pi = self.actor(state)
+			with self._autocast():
+				pi = self.actor(state).float()
 			with torch.no_grad():
-				awr_v = self.value_critic(state)
-				awr_q1, awr_q2 = self.critic_target(state, action)
-				awr_q = torch.minimum(awr_q1, awr_q2)
+				with self._autocast():
+					awr_v = self.value_critic(state).float()
+				awr_q = target_sa_min
 				exp_a = torch.exp((awr_q - awr_v) * self.temp)
 				exp_a = torch.clamp(exp_a, max=self.max_weight).detach()
 
-			v1,v2 = self.critic(state, pi)
-			v = torch.cat([v1,v2], dim=1)
-			vmin,_ = torch.min(v, dim=1)
+			with self._autocast():
+				v1,v2 = self._critic_local(torch.cat([state, pi], -1))
+				vmin = torch.minimum(v1, v2).squeeze(-1).float()
 			lmbda = 1.0 / vmin.abs().mean().detach() # follow TD3BC
 			q_loss = -lmbda * vmin.mean()
 
 			awr_loss = (exp_a * ((pi - action)**2)).mean()
 			actor_loss = q_loss + nu * awr_loss
 
-			self.actor_optimizer.zero_grad()
+			self.actor_optimizer.zero_grad(set_to_none=True)
 			actor_loss.backward()
 			self.actor_optimizer.step()
 
 			if self.total_it % 10000 == 0:
-				writer.add_scalar('train/actor_loss', actor_loss.item(), self.total_it)
+				self._log_scalars(writer, {'train/actor_loss': actor_loss})
 				writer.add_scalar('train/lam', lam, self.total_it)
 				writer.add_scalar('train/nu', nu, self.total_it)
 
 			# Update the frozen target models
-			for param, target_param in zip(self.critic.parameters(), self.critic_target.parameters()):
-				target_param.data.copy_(self.tau * param.data + (1 - self.tau) * target_param.data)
-
-			for param, target_param in zip(self.actor.parameters(), self.actor_target.parameters()):
-				target_param.data.copy_(self.tau * param.data + (1 - self.tau) * target_param.data)
+			self._soft_update_targets()
     
 	def save(self, model_dir):
-		torch.save(self.critic.state_dict(), os.path.join(model_dir, f"critic_s{str(self.total_it)}.pth"))
-		torch.save(self.critic_target.state_dict(), os.path.join(model_dir, f"critic_target_s{str(self.total_it)}.pth"))
-		torch.save(self.critic_optimizer.state_dict(), os.path.join(
-			model_dir, f"critic_optimizer_s{str(self.total_it)}.pth"))
-
-		torch.save(self.value_critic.state_dict(), os.path.join(model_dir, f"value_critic_s{str(self.total_it)}.pth"))
-		torch.save(self.value_critic_optimizer.state_dict(), os.path.join(
-			model_dir, f"value_critic_optimizer_s{str(self.total_it)}.pth"))
-
-		torch.save(self.actor.state_dict(), os.path.join(model_dir, f"actor_s{str(self.total_it)}.pth"))
-		torch.save(self.actor_target.state_dict(), os.path.join(model_dir, f"actor_target_s{str(self.total_it)}.pth"))
-		torch.save(self.actor_optimizer.state_dict(), os.path.join(
-			model_dir, f"actor_optimizer_s{str(self.total_it)}.pth"))
+		# snapshot to (pinned) host memory now; serialisation happens on the background save thread
+		state_dicts = {
+			"critic": self._unwrap(self.critic).state_dict(),
+			"critic_target": self._unwrap(self.critic_target).state_dict(),
+			"critic_optimizer": self.critic_optimizer.state_dict(),
+			"value_critic": self._unwrap(self.value_critic).state_dict(),
+			"value_critic_optimizer": self.value_critic_optimizer.state_dict(),
+			"actor": self._unwrap(self.actor).state_dict(),
+			"actor_target": self._unwrap(self.actor_target).state_dict(),
+			"actor_optimizer": self.actor_optimizer.state_dict(),
+		}
+		replicas = {name: host_copy(sd) for name, sd in state_dicts.items()}
+		event = None
+		if device.type == "cuda":
+			event = torch.cuda.Event()
+			event.record()
+		self._save_futures.append(self._save_executor.submit(
+			self._write_checkpoint, replicas, event, model_dir, self.total_it))
+
+	@staticmethod
+	def _write_checkpoint(replicas, event, model_dir, step):
+		if event is not None:
+			event.synchronize()
+		for name, sd in replicas.items():
+			torch.save(sd, os.path.join(model_dir, f"{name}_s{str(step)}.pth"))
+
+	def wait_saves(self):
+		for future in self._save_futures:
+			future.result()
+		self._save_futures = []
 
 	def load(self, model_dir, step=1000000):
-		self.critic.load_state_dict(torch.load(os.path.join(model_dir, f"critic_s{str(step)}.pth")))
-		self.critic_target.load_state_dict(torch.load(os.path.join(model_dir, f"critic_target_s{str(step)}.pth")))
-		self.critic_optimizer.load_state_dict(torch.load(os.path.join(model_dir, f"critic_optimizer_s{str(step)}.pth")))
+		# offline checkpoints saved before the critic heads were stacked are remapped on load
+		self._unwrap(self.critic).load_state_dict(stack_twin_critic(torch.load(os.path.join(model_dir, f"critic_s{str(step)}.pth"))))
+		self._unwrap(self.critic_target).load_state_dict(stack_twin_critic(torch.load(os.path.join(model_dir, f"critic_target_s{str(step)}.pth"))))
+		self.critic_optimizer.load_state_dict(stack_twin_critic_optimizer(torch.load(os.path.join(model_dir, f"critic_optimizer_s{str(step)}.pth"))))
 
-		self.value_critic.load_state_dict(torch.load(os.path.join(model_dir, f"value_critic_s{str(step)}.pth")))
+		self._unwrap(self.value_critic).load_state_dict(torch.load(os.path.join(model_dir, f"value_critic_s{str(step)}.pth")))
 		self.value_critic_optimizer.load_state_dict(torch.load(os.path.join(model_dir, f"value_critic_optimizer_s{str(step)}.pth")))
 
-		self.actor.load_state_dict(torch.load(os.path.join(model_dir, f"actor_s{str(step)}.pth")))
-		self.actor_target.load_state_dict(torch.load(os.path.join(model_dir, f"actor_target_s{str(step)}.pth")))
+		self._unwrap(self.actor).load_state_dict(torch.load(os.path.join(model_dir, f"actor_s{str(step)}.pth")))
+		self._unwrap(self.actor_target).load_state_dict(torch.load(os.path.join(model_dir, f"actor_target_s{str(step)}.pth")))
 		self.actor_optimizer.load_state_dict(torch.load(os.path.join(model_dir, f"actor_optimizer_s{str(step)}.pth")))
-		self.actor_optimizer.param_groups[0]['lr'] = 3e-4
\ No newline at end of file
+		if isinstance(self.actor_optimizer.param_groups[0]['lr'], torch.Tensor):
+			self.actor_optimizer.param_groups[0]['lr'].fill_(3e-4)
+		else:
+			self.actor_optimizer.param_groups[0]['lr'] = 3e-4
\ No newline at end of file
@@ -25,10 +25,14 @@ def eval_policy(policy, env_name, seed, mean, std, seed_offset=100, eval_episode
 	eval_env.seed(seed + seed_offset)
 	eval_env.action_space.seed(seed + seed_offset)
 	avg_reward = 0.
+	mean32 = np.asarray(mean, dtype=np.float32)
+	inv_std = (1.0 / np.asarray(std)).astype(np.float32)
 	for _ in range(eval_episodes):
 		state, done = eval_env.reset(), False
 		while not done:
-			state = (np.array(state).reshape(1,-1) - mean)/std
+			state = np.subtract(state, mean32, dtype=np.float32)
+			np.multiply(state, inv_std, out=state)
+			state = state.reshape(1,-1)
 			action = policy.select_action(state)
 			state, reward, done, _ = eval_env.step(action)
 			avg_reward += reward
@@ -57,6 +61,7 @@ if __name__ == "__main__":
 	parser.add_argument("--lam", default=0.25, type=float)          # DMG parameter /lambda used in offline RL
 	parser.add_argument("--nu", default=0.5, type=float)            # DMG parameter /nu used in offline RL
 	parser.add_argument("--save_model", action="store_true")        # Save trained models
+	parser.add_argument("--bf16", action="store_true")              # bf16 autocast for network forwards (Ampere+ GPUs)
 
 	# Offline-to-online Finetune
 	parser.add_argument("--lam_end", default=0.5, type=float)       # Final value of /lambda after decay
@@ -105,7 +110,7 @@ if __name__ == "__main__":
 		mean,std = replay_buffer.normalize_states()
 
 	if 'antmaze' in args.env:
-		replay_buffer.reward = np.where(replay_buffer.reward == 1.0, 0.0, -1.0) # follow D4RL instructions
+		replay_buffer.relabel_antmaze_rewards() # follow D4RL instructions
 		antmaze = True
 		args.eval_episodes = 100 if args.eval_episodes is None else args.eval_episodes
 		args.eval_freq = 50000 if args.eval_freq is None else args.eval_freq
@@ -134,6 +139,7 @@ if __name__ == "__main__":
 		"lam_end": args.lam_end,
 		"nu": args.nu,
 		"nu_end": args.nu_end,
+		"bf16": args.bf16,
 	}
 
 	policy = DMG.DMG(**kwargs)
@@ -184,6 +190,8 @@ if __name__ == "__main__":
 			print(f"Time steps: {t+1}")
 			d4rl_score = eval_policy(policy, args.env, args.seed, mean, std, eval_episodes=args.eval_episodes)
 			writer.add_scalar('eval/d4rl_score', d4rl_score, t)
+	policy.flush_logs()
 	if args.save_model:
 		policy.save(work_dir)
+		policy.wait_saves()
 	time.sleep( 10 )
@@ -36,10 +36,14 @@ def eval_policy(policy, env_name, seed, mean, std, seed_offset=100, eval_episode
 	eval_env.seed(seed + seed_offset)
 	eval_env.action_space.seed(seed + seed_offset)
 	avg_reward = 0.
+	mean32 = np.asarray(mean, dtype=np.float32)
+	inv_std = (1.0 / np.asarray(std)).astype(np.float32)
 	for _ in range(eval_episodes):
 		state, done = eval_env.reset(), False
 		while not done:
-			state = (np.array(state).reshape(1,-1) - mean)/std
+			state = np.subtract(state, mean32, dtype=np.float32)
+			np.multiply(state, inv_std, out=state)
+			state = state.reshape(1,-1)
 			action = policy.select_action(state)
 			state, reward, done, _ = eval_env.step(action)
 			avg_reward += reward
@@ -69,21 +73,34 @@ if __name__ == "__main__":
 	parser.add_argument("--lam", default=0.25, type=float)          # DMG parameter /lambda used in offline RL
 	parser.add_argument("--nu", default=0.5, type=float)            # DMG parameter /nu used in offline RL
 	parser.add_argument("--save_model", action="store_true")        # Save trained models
+	parser.add_argument("--cuda_graph", action="store_true")        # Replay each training step as a CUDA graph
+	parser.add_argument("--compile", action="store_true")           # Build networks with torch.compile(mode="max-autotune")
+	parser.add_argument("--bf16", action="store_true")              # bf16 autocast for network forwards (Ampere+ GPUs)
+	parser.add_argument("--profile", action="store_true")           # Profile the first training steps with torch.profiler
 	args = parser.parse_args()
 
 	print("---------------------------------------")
 	print(f"Env: {args.env}, Seed: {args.seed}")
 	print("---------------------------------------")
 
+	# launched with torchrun: one process per GPU, each sampling its own batches
+	distributed = "LOCAL_RANK" in os.environ
+	if distributed:
+		torch.distributed.init_process_group(backend="nccl")
+		torch.cuda.set_device(int(os.environ["LOCAL_RANK"]))
+		rank = torch.distributed.get_rank()
+	else:
+		rank = 0
+
 	env = gym.make(args.env)
 	work_dir = './runs/offline/{}/lam{}_nu{}_seed{}'.format(
      args.env, args.lam, args.nu, args.seed)
 	# Set seeds
 	env.seed(args.seed)
 	env.action_space.seed(args.seed)
-	torch.manual_seed(args.seed)
+	torch.manual_seed(args.seed) # same network init on every rank
 	if torch.cuda.is_available():
-		torch.cuda.manual_seed_all(args.seed)
+		torch.cuda.manual_seed_all(args.seed + rank) # different replay-buffer samples per rank
 	np.random.seed(args.seed)
 	random.seed(args.seed)
 	
@@ -91,10 +108,12 @@ if __name__ == "__main__":
 	action_dim = env.action_space.shape[0] 
 	max_action = float(env.action_space.high[0])
 
-	writer = SummaryWriter(work_dir)
-	with open(os.path.join(work_dir, 'args.json'), 'w') as f:
-		json.dump(vars(args), f, sort_keys=True, indent=4)
-	snapshot_src('.', os.path.join(work_dir, 'src'), '.gitignore')
+	writer = None
+	if rank == 0:
+		writer = SummaryWriter(work_dir)
+		with open(os.path.join(work_dir, 'args.json'), 'w') as f:
+			json.dump(vars(args), f, sort_keys=True, indent=4)
+		snapshot_src('.', os.path.join(work_dir, 'src'), '.gitignore')
 
 	replay_buffer = utils.ReplayBuffer(state_dim, action_dim)
 	replay_buffer.convert_D4RL(d4rl.qlearning_dataset(env))
@@ -104,7 +123,7 @@ if __name__ == "__main__":
 	else:
 		mean,std = 0,1
 	if 'antmaze' in args.env:
-		replay_buffer.reward = np.where(replay_buffer.reward == 1.0, 0.0, -1.0)
+		replay_buffer.relabel_antmaze_rewards()
 		antmaze = True
 		args.eval_episodes = 100 if args.eval_episodes is None else args.eval_episodes
 		args.eval_freq = 50000 if args.eval_freq is None else args.eval_freq
@@ -130,17 +149,42 @@ if __name__ == "__main__":
 		"temp": temp,
 		"lam": args.lam,
 		"nu": args.nu,
+		"cuda_graph": args.cuda_graph,
+		"torch_compile": args.compile,
+		"bf16": args.bf16,
 	}
 
 	policy = DMG.DMG(**kwargs)
+
+	prof = None
+	if args.profile and rank == 0:
+		activities = [torch.profiler.ProfilerActivity.CPU]
+		if torch.cuda.is_available():
+			activities.append(torch.profiler.ProfilerActivity.CUDA)
+		prof = torch.profiler.profile(
+			activities=activities,
+			schedule=torch.profiler.schedule(wait=10, warmup=10, active=200),
+			on_trace_ready=torch.profiler.tensorboard_trace_handler(os.path.join(work_dir, 'profile')))
+		prof.start()
 	
 	for t in trange(int(args.max_timesteps)):
 		policy.train_offline(args.batch_size, writer)
+		if prof is not None:
+			prof.step()
+			if t + 1 == 220:
+				prof.stop()
+				sort_by = "self_cuda_time_total" if torch.cuda.is_available() else "self_cpu_time_total"
+				print(prof.key_averages().table(sort_by=sort_by, row_limit=20))
+				prof = None
 		# Evaluate episode
-		if (t + 1) % args.eval_freq == 0:
+		if rank == 0 and (t + 1) % args.eval_freq == 0:
 			print(f"Time steps: {t+1}")
 			d4rl_score = eval_policy(policy, args.env, args.seed, mean, std, eval_episodes=args.eval_episodes)
 			writer.add_scalar('eval/d4rl_score', d4rl_score, t)
-	if args.save_model:
+	policy.flush_logs()
+	if rank == 0 and args.save_model:
 		policy.save(work_dir)
+		policy.wait_saves()
+	if distributed:
+		torch.distributed.destroy_process_group()
 	time.sleep( 10 )
@@ -8,19 +8,38 @@ class ReplayBuffer(object):
 		self.ptr = 0
 		self.size = 0
 
-		self.state = np.zeros((max_size, state_dim))
-		self.action = np.zeros((max_size, action_dim))
-		self.next_state = np.zeros((max_size, state_dim))
-		self.reward = np.zeros((max_size, 1))
-		self.not_done = np.zeros((max_size, 1))
+		self.state_dim = state_dim
+		self.action_dim = action_dim
 
 		self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
 
+		# storage is allocated on first use, since convert_D4RL replaces it with the dataset tensors
+		self.state = None
+		self.action = None
+		self.next_state = None
+		self.reward = None
+		self.not_done = None
+
+
+	def _allocate(self):
+		# transitions live on the training device so sampling is a single on-device gather
+		self.state = torch.zeros((self.max_size, self.state_dim), device=self.device)
+		self.action = torch.zeros((self.max_size, self.action_dim), device=self.device)
+		self.next_state = torch.zeros((self.max_size, self.state_dim), device=self.device)
+		self.reward = torch.zeros((self.max_size, 1), device=self.device)
+		self.not_done = torch.zeros((self.max_size, 1), device=self.device)
+
+
+	def _to_tensor(self, x):
+		return torch.as_tensor(x, dtype=torch.float32).to(self.device).contiguous()
+
 
 	def add(self, state, action, next_state, reward, done):
-		self.state[self.ptr] = state
-		self.action[self.ptr] = action
-		self.next_state[self.ptr] = next_state
+		if self.state is None:
+			self._allocate()
+		self.state[self.ptr] = self._to_tensor(state)
+		self.action[self.ptr] = self._to_tensor(action)
+		self.next_state[self.ptr] = self._to_tensor(next_state)
 		self.reward[self.ptr] = reward
 		self.not_done[self.ptr] = 1. - done
 
@@ -29,38 +48,45 @@ class ReplayBuffer(object):
 
 
 	def sample(self, batch_size):
-		ind = np.random.randint(0, self.size, size=batch_size)
+		ind = torch.randint(0, self.size, (batch_size,), device=self.device)
 
 		return (
-			torch.FloatTensor(self.state[ind]).to(self.device),
-			torch.FloatTensor(self.action[ind]).to(self.device),
-			torch.FloatTensor(self.next_state[ind]).to(self.device),
-			torch.FloatTensor(self.reward[ind]).to(self.device),
-			torch.FloatTensor(self.not_done[ind]).to(self.device)
+			self.state[ind],
+			self.action[ind],
+			self.next_state[ind],
+			self.reward[ind],
+			self.not_done[ind]
 		)
 
 
 	def convert_D4RL(self, dataset):
-		self.state = dataset['observations']
-		self.action = dataset['actions']
-		self.next_state = dataset['next_observations']
-		self.reward = dataset['rewards'].reshape(-1,1)
-		self.not_done = 1. - dataset['terminals'].reshape(-1,1)
+		self.state = self._to_tensor(dataset['observations'])
+		self.action = self._to_tensor(dataset['actions'])
+		self.next_state = self._to_tensor(dataset['next_observations'])
+		self.reward = self._to_tensor(dataset['rewards'].reshape(-1,1))
+		self.not_done = self._to_tensor(1. - dataset['terminals'].reshape(-1,1))
 		self.size = self.state.shape[0]
 
 	def convert_D4RL_finetune(self, dataset):
+		# online transitions are appended after the dataset, so this needs the full max_size buffer
+		self._allocate()
 		self.ptr = dataset['observations'].shape[0]
 		self.size = dataset['observations'].shape[0]
-		self.state[:self.ptr] = dataset['observations']
-		self.action[:self.ptr] = dataset['actions']
-		self.next_state[:self.ptr] = dataset['next_observations']
-		self.reward[:self.ptr] = dataset['rewards'].reshape(-1, 1)
-		self.not_done[:self.ptr] = 1. - dataset['terminals'].reshape(-1, 1)
+		self.state[:self.ptr] = self._to_tensor(dataset['observations'])
+		self.action[:self.ptr] = self._to_tensor(dataset['actions'])
+		self.next_state[:self.ptr] = self._to_tensor(dataset['next_observations'])
+		self.reward[:self.ptr] = self._to_tensor(dataset['rewards'].reshape(-1, 1))
+		self.not_done[:self.ptr] = self._to_tensor(1. - dataset['terminals'].reshape(-1, 1))
+
+
+	def relabel_antmaze_rewards(self):
+		# 0 at the goal, -1 otherwise (D4RL antmaze); stays a (N,1) float32 tensor so the Bellman target needs no cast or broadcast
+		self.reward = torch.where(self.reward == 1.0, 0.0, -1.0).to(torch.float32).reshape(-1, 1)
 
 
 	def normalize_states(self, eps = 1e-3):
-		mean = self.state.mean(0,keepdims=True)
-		std = self.state.std(0,keepdims=True) + eps
+		mean = self.state.mean(0,keepdim=True)
+		std = self.state.std(0,keepdim=True,unbiased=False) + eps
 		self.state = (self.state - mean)/std
 		self.next_state = (self.next_state - mean)/std
-		return mean, std
\ No newline at end of file
+		return mean.cpu().numpy(), std.cpu().numpy()